@@ -1,37 +1,56 @@
+import asyncio
 import logging
 import os
+import threading
 from contextlib import AsyncExitStack
 from typing import List, Optional, Tuple
 
+import cachetools
+
+from typing import TYPE_CHECKING
+
 from google.adk.agents import Agent
 from google.adk.tools import BaseTool
 
-# Import Secret Manager client
-try:
+if TYPE_CHECKING:
   from google.cloud import secretmanager
-except ImportError:
-  raise ImportError(
-      "Please install google-cloud-secret-manager: pip install"
-      " google-cloud-secret-manager"
-  )
 
-# Import MCPToolset and connection parameters
-try:
-  from google.adk.tools.mcp_tool import MCPToolset
-  from google.adk.tools.mcp_tool.mcp_session_manager import SseServerParams
-
-  # StdioServerParameters can be used if connecting to local command-line MCP servers
-  # from mcp import StdioServerParameters
-except ImportError as e:
-  # Provide a helpful error message if MCP dependencies are missing
-  raise ImportError(
-      "MCP Toolset requires 'google-adk[mcp]' extras or Python 3.10+."
-      " Please install dependencies and ensure you are using Python 3.10 or"
-      " higher."
-  ) from e
+# The Secret Manager and MCP toolset imports drag in large gRPC/protobuf
+# trees, so they are deferred to first use (see _import_secretmanager and
+# _import_mcp below) to keep module import — and hence cold start — cheap.
 
 logger = logging.getLogger(__name__)
 
+
+def _import_secretmanager():
+  """Imports google.cloud.secretmanager lazily."""
+  try:
+    from google.cloud import secretmanager
+  except ImportError:
+    raise ImportError(
+        "Please install google-cloud-secret-manager: pip install"
+        " google-cloud-secret-manager"
+    )
+  return secretmanager
+
+
+def _import_mcp():
+  """Imports the MCP toolset classes lazily."""
+  try:
+    from google.adk.tools.mcp_tool import MCPToolset
+    from google.adk.tools.mcp_tool.mcp_session_manager import SseServerParams
+
+    # StdioServerParameters can be used if connecting to local command-line MCP servers
+    # from mcp import StdioServerParameters
+  except ImportError as e:
+    # Provide a helpful error message if MCP dependencies are missing
+    raise ImportError(
+        "MCP Toolset requires 'google-adk[mcp]' extras or Python 3.10+."
+        " Please install dependencies and ensure you are using Python 3.10 or"
+        " higher."
+    ) from e
+  return MCPToolset, SseServerParams
+
 # --- Configuration ---
 # Load MCP URLs from environment variables (defined in .env)
 MCP_URL_GET_CHANNEL_VIDEOS = os.getenv("MCP_URL_GET_CHANNEL_VIDEOS")
@@ -46,18 +65,52 @@ GOOGLE_API_KEY_SECRET_RESOURCE_NAME = os.getenv(
 
 # --- Secret Manager Helper ---
 
-def fetch_secret(secret_resource_name: str) -> Optional[str]:
-  """Fetches a secret from Google Cloud Secret Manager."""
+# Secrets are cached per resource name so repeated agent loads (e.g. `adk web`
+# hot-reload) skip the Secret Manager round-trip after the first fetch.
+_secret_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=16, ttl=3600)
+_secret_lock = threading.Lock()
+
+# The Secret Manager client is created lazily on first use (not at import
+# time) and then reused, so the underlying gRPC channel is set up only once.
+_secret_client: Optional["secretmanager.SecretManagerServiceClient"] = None
+
+
+def _get_secret_client() -> "secretmanager.SecretManagerServiceClient":
+  """Returns a lazily-initialized, process-wide Secret Manager client."""
+  global _secret_client
+  if _secret_client is None:
+    secretmanager = _import_secretmanager()
+    _secret_client = secretmanager.SecretManagerServiceClient()
+  return _secret_client
+
+
+async def fetch_secret(secret_resource_name: str) -> Optional[str]:
+  """Fetches a secret from Google Cloud Secret Manager (cached with a TTL).
+
+  The synchronous gRPC call runs in a worker thread so the event loop stays
+  free to progress other startup I/O (e.g. the MCP toolset connections).
+  """
   if not secret_resource_name:
     logger.warning(
         "Secret resource name (GOOGLE_API_KEY_SECRET_RESOURCE_NAME) not"
         " provided in .env file."
     )
     return None
+  with _secret_lock:
+    cached = _secret_cache.get(secret_resource_name)
+  if cached is not None:
+    logger.info("Using cached secret for %s", secret_resource_name)
+    return cached
   try:
-    client = secretmanager.SecretManagerServiceClient()
-    response = client.access_secret_version(name=secret_resource_name)
+    client = _get_secret_client()
+    # The lock is deliberately released during the network call; a duplicate
+    # fetch on a cold cache is cheaper than serializing all callers on I/O.
+    response = await asyncio.to_thread(
+        client.access_secret_version, name=secret_resource_name
+    )
     secret_value = response.payload.data.decode("UTF-8")
+    with _secret_lock:
+      _secret_cache[secret_resource_name] = secret_value
     logger.info(
         "Successfully fetched secret from %s", secret_resource_name
     )
@@ -70,6 +123,21 @@ def fetch_secret(secret_resource_name: str) -> Optional[str]:
     # raise RuntimeError(f"Could not fetch secret: {e}") from e
     return None
 
+# The instruction is static except for the tool list, so the template lives
+# at module scope and only the tool lines are interpolated at load time.
+AGENT_INSTRUCTION_TEMPLATE = """You are YouBuddy, an expert YouTube assistant created by Amulya Bhatia. Your goal is to help users by fetching videos and creating summaries based on their requests.
+
+You have access to the following tools:
+{tool_lines}
+
+Based on the user's request:
+1.  Determine if you need videos from a specific channel and date OR from a specific playlist. Use the appropriate tool (`get_channel_videos` or `get_playlist_videos`) to fetch the list of video URLs or IDs.
+2.  For each relevant video identified in step 1, use the `summarize_video` tool to get its summary.
+3.  If multiple summaries were generated, use the `combine_summaries` tool to create a final, consolidated summary.
+4.  Present the final summary to the user. If only one video was summarized, present that summary directly.
+5.  If a tool fails, inform the user you couldn't complete the request due to a tool issue.
+"""
+
 # Ensure URLs are configured
 if not all([
     MCP_URL_GET_CHANNEL_VIDEOS,
@@ -87,6 +155,7 @@ async def load_mcp_tools(
     exit_stack: AsyncExitStack,
 ) -> List[BaseTool]:
   """Loads tools from multiple MCP servers asynchronously."""
+  MCPToolset, SseServerParams = _import_mcp()
   all_tools = []
   mcp_connections = {
       "get_channel_videos": SseServerParams(url=MCP_URL_GET_CHANNEL_VIDEOS),
@@ -95,35 +164,107 @@ async def load_mcp_tools(
       "combine_summaries": SseServerParams(url=MCP_URL_COMBINE_SUMMARIES),
   }
 
+  async def _load_one(name: str, params) -> List[BaseTool]:
+    logger.debug("Loading tools from %s at %s...", name, params.url)
+    # Create a toolset for each connection, managed by the *same* exit_stack
+    toolset = MCPToolset(connection_params=params, exit_stack=exit_stack)
+    # Enter the context manager for the toolset
+    await exit_stack.enter_async_context(toolset)
+    # Load tools from this specific toolset
+    tools = await toolset.load_tools()
+    # Lazy %-formatting: the tool-name list is only built when the record
+    # is actually emitted.
+    logger.debug(
+        "Successfully loaded %d tools from %s: %s",
+        len(tools), name, [t.name for t in tools]
+    )
+    return tools
+
   logger.info("Connecting to MCP servers and loading tools...")
-  for name, params in mcp_connections.items():
-    logger.info(f"Loading tools from {name} at {params.url}...")
-    try:
-      # Create a toolset for each connection, managed by the *same* exit_stack
-      toolset = MCPToolset(connection_params=params, exit_stack=exit_stack)
-      # Enter the context manager for the toolset
-      await exit_stack.enter_async_context(toolset)
-      # Load tools from this specific toolset
-      tools = await toolset.load_tools()
-      all_tools.extend(tools)
-      logger.info(
-          f"Successfully loaded {len(tools)} tools from {name}:"
-          f" {[t.name for t in tools]}"
+  # Each server is an independent endpoint, so open the SSE connections
+  # concurrently instead of paying one round-trip after another.
+  results = await asyncio.gather(
+      *(_load_one(name, params) for name, params in mcp_connections.items()),
+      return_exceptions=True,
+  )
+  for (name, params), result in zip(mcp_connections.items(), results):
+    if isinstance(result, BaseException):
+      logger.error(
+          "Failed to load tools from %s (%s): %s", name, params.url, result
       )
-    except Exception as e:
-      logger.error(f"Failed to load tools from {name} ({params.url}): {e}")
-      # Decide if you want to raise the error or continue loading other tools
-      # raise  # Uncomment to stop if one connection fails
+      # Continue with whatever toolsets did connect, matching the previous
+      # "continue on failure" behavior of the sequential loop.
+    else:
+      all_tools.extend(result)
 
   if not all_tools:
     logger.warning(
         "No MCP tools were loaded. Check MCP server URLs and availability."
     )
 
-  logger.info(f"Total MCP tools loaded: {len(all_tools)}")
+  logger.info("Total MCP tools loaded: %d", len(all_tools))
   return all_tools
 
 
+# --- MCP Toolset Lifecycle Management ---
+
+async def _run_toolset_manager(
+    tools_out: List[BaseTool],
+    ready_event: asyncio.Event,
+    shutdown_event: asyncio.Event,
+) -> None:
+  """Owns the MCP connections' exit stack in a long-lived background task.
+
+  If the exit stack lived in the coroutine that creates the agent and that
+  task died (hot-reload, timeout), the SSE connections to the MCP servers
+  could never be cleaned up. This task loads the tools, publishes them via
+  `tools_out`/`ready_event`, and holds the stack open until
+  `shutdown_event` is set, at which point the connections are closed here —
+  in the same task that opened them.
+  """
+  try:
+    async with AsyncExitStack() as stack:
+      try:
+        tools_out.extend(await load_mcp_tools(stack))
+      finally:
+        ready_event.set()
+      await shutdown_event.wait()
+    logger.info("MCP toolset connections closed.")
+  except Exception:
+    ready_event.set()
+    logger.exception("MCP toolset manager task failed.")
+    raise
+
+
+async def start_mcp_tools(
+    exit_stack: AsyncExitStack,
+) -> List[BaseTool]:
+  """Loads MCP tools via a detached manager task and wires its shutdown.
+
+  The returned tools are loaded by a background task that owns their
+  connections; `exit_stack` only carries a callback that signals the task
+  to shut down and waits for it.
+  """
+  tools: List[BaseTool] = []
+  ready_event = asyncio.Event()
+  shutdown_event = asyncio.Event()
+  manager_task = asyncio.create_task(
+      _run_toolset_manager(tools, ready_event, shutdown_event)
+  )
+
+  async def _shutdown_toolsets() -> None:
+    shutdown_event.set()
+    try:
+      await manager_task
+    except Exception:
+      # Already logged by the manager task; don't mask other cleanup.
+      pass
+
+  exit_stack.push_async_callback(_shutdown_toolsets)
+  await ready_event.wait()
+  return tools
+
+
 # --- Agent Definition (Asynchronous Loading Wrapper) ---
 
 # ADK's `adk web` command can handle an awaitable root_agent.
@@ -131,12 +272,18 @@ async def load_mcp_tools(
 async def load_youbuddy_agent() -> Tuple[Agent, AsyncExitStack]:
   """Asynchronously loads MCP tools and creates the YouBuddy agent."""
 
-  # AsyncExitStack manages the cleanup of MCP connections
+  # The exit stack returned to ADK only triggers the toolset manager's
+  # shutdown; the MCP connections themselves are owned by that task.
   exit_stack = AsyncExitStack()
   try:
 
     logger.info("Attempting to fetch GOOGLE_API_KEY from Secret Manager...")
-    secret_value = fetch_secret(GOOGLE_API_KEY_SECRET_RESOURCE_NAME)
+    # The secret fetch and the MCP connections are independent I/O paths, so
+    # run them concurrently instead of one after the other.
+    secret_value, mcp_tools = await asyncio.gather(
+        fetch_secret(GOOGLE_API_KEY_SECRET_RESOURCE_NAME),
+        start_mcp_tools(exit_stack),
+    )
     if secret_value:
       os.environ["GOOGLE_API_KEY"] = secret_value
       logger.info("GOOGLE_API_KEY environment variable set from Secret Manager.")
@@ -146,9 +293,14 @@ async def load_youbuddy_agent() -> Tuple[Agent, AsyncExitStack]:
           "Failed to get GOOGLE_API_KEY from Secret Manager and it's not set"
           " in the environment. Agent cannot initialize."
       )
-      
-    # Load all tools from the configured MCP servers
-    mcp_tools = await load_mcp_tools(exit_stack)
+
+    # Compose the tool list once; the rest of the instruction is a
+    # module-level constant.
+    tool_lines = "\n".join(
+        f"- {tool.name}: {tool.description}"
+        for tool in mcp_tools
+        if tool.description
+    )
 
     # Define the main agent
     youbuddy_agent = Agent(
@@ -158,18 +310,7 @@ async def load_youbuddy_agent() -> Tuple[Agent, AsyncExitStack]:
             "An agent specializing in fetching and summarizing YouTube videos"
             " from channels or playlists using specialized tools."
         ),
-        instruction=f"""You are YouBuddy, an expert YouTube assistant created by Amulya Bhatia. Your goal is to help users by fetching videos and creating summaries based on their requests.
-
-You have access to the following tools:
-{chr(10).join([f'- {tool.name}: {tool.description}' for tool in mcp_tools if tool.description])}
-
-Based on the user's request:
-1.  Determine if you need videos from a specific channel and date OR from a specific playlist. Use the appropriate tool (`get_channel_videos` or `get_playlist_videos`) to fetch the list of video URLs or IDs.
-2.  For each relevant video identified in step 1, use the `summarize_video` tool to get its summary.
-3.  If multiple summaries were generated, use the `combine_summaries` tool to create a final, consolidated summary.
-4.  Present the final summary to the user. If only one video was summarized, present that summary directly.
-5.  If a tool fails, inform the user you couldn't complete the request due to a tool issue.
-""",
+        instruction=AGENT_INSTRUCTION_TEMPLATE.format(tool_lines=tool_lines),
         tools=mcp_tools, # Pass the loaded MCP tools here
     )
     # Return the agent instance AND the exit_stack for lifecycle management
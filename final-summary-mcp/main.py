@@ -1,9 +1,11 @@
 import os
 import logging
+from contextlib import asynccontextmanager
+
 import uvicorn # Import uvicorn for running the app
 
 from google import genai
-# from google.genai import types # types might be needed if using GenerationConfig
+from google.genai import types
 
 from fastapi import FastAPI, HTTPException, Body, Request # Import FastAPI components
 from fastapi.responses import PlainTextResponse # For the simple index route response
@@ -12,19 +14,52 @@ from fastapi_mcp import FastApiMCP
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# --- Lifespan: shared Gemini client ---
+# Creating genai.Client per request rebuilds the HTTPS connection pool and
+# auth state on every call. Create it once at startup instead and reuse it;
+# this also fails fast if the API key is missing rather than per request.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    gemini_api_key = os.environ.get("GEMINI_API_KEY")
+    if not gemini_api_key:
+        logging.error("FATAL: GEMINI_API_KEY environment variable not set.")
+        raise RuntimeError("GEMINI_API_KEY environment variable not set.")
+    # A bounded timeout keeps a slow Gemini call from pinning a worker for
+    # the (very long) default socket timeout; the single shared client means
+    # all requests reuse the same pooled TLS connections.
+    app.state.genai_client = genai.Client(
+        api_key=gemini_api_key,
+        http_options=types.HttpOptions(timeout=30_000),  # milliseconds
+    )
+    yield
+
+# The prompt is static except for the input data appended at the end, so the
+# whole prefix is built once at import time instead of re-interpolated per
+# request.
+_PROMPT_PREFIX = """**Role:** You are an expert synthesizer of information.
+
+**Goal:** Combine information from multiple topical summaries into one comprehensive and coherent final summary.
+
+**Input Data:**I am providing a numbered list of key points from a number of youtube videos. Each point has a descriptive title and a summary of that aspect.
+
+**Your Task:**
+1.  Read through all the provided title-summary pairs.
+2.  Identify the connections and overarching narrative across the sections.
+3.  Write a **single, flowing final summary** that integrates the key information from *all* the provided summaries.
+4.  **Crucially, ensure that every concept represented by the Bolded Headings is explicitly mentioned or clearly addressed within your final summary.** Weave these topics naturally into the narrative.
+5.  The final output should be easy to read and understand, presenting a unified overview of the collective information.
+
+**Generate the Final Summary based on the provided input data:**
+"""
+
 # --- Initialize FastAPI App ---
 app = FastAPI(
     title="Final Summary Service",
     description="An API to generate summaries from other text summaries.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# --- Global Client Initialization (Optional but can be efficient) ---
-# It's often better to initialize clients outside the request handler
-# if the configuration doesn't change per request.
-# However, we need the API key which might change or needs checking per request.
-# Let's stick to initializing within the handler for this refactor to match original logic closely.
-
 @app.post(
     "/summary", 
     operation_id="generate_final_summary", 
@@ -32,59 +67,30 @@ app = FastAPI(
     summary="Generate a comprehensive and coherent summary from a numbered list of key points from a number of youtube videos.",
     tags=["Final Summarization"])
 async def generate_summary(
+    request: Request,
     # Use Body(...) to receive the raw request body as a string
     input_data: str = Body(..., media_type="text/plain", description="Numbered list of key points from YouTube videos.")
 ):
     """
     Generates a comprehensive and coherent summary from a numbered list of key points from a number of youtube videos.
     """
-    #client = genai.Client(
-     #   vertexai=True,
-      #  project="genai-setup",
-       # location="us-central1",
-    #)
-
-    gemini_api_key = os.environ.get("GEMINI_API_KEY")
-    if not gemini_api_key:
-        logging.error("FATAL: GEMINI_API_KEY environment variable not set.")
-        # Use HTTPException for errors in FastAPI
-        raise HTTPException(
-            status_code=500,
-            detail="Server configuration error: API key missing"
-        )
+    client = request.app.state.genai_client
 
     try:
+        prompt = _PROMPT_PREFIX + input_data
 
-        client = genai.Client(
-            api_key=gemini_api_key,
-        )
-
-        input_data = request.get_data(as_text=True)
-
-        prompt_template = f"""**Role:** You are an expert synthesizer of information.
-
-        **Goal:** Combine information from multiple topical summaries into one comprehensive and coherent final summary.
-
-        **Input Data:**I am providing a numbered list of key points from a number of youtube videos. Each point has a descriptive title and a summary of that aspect.
-
-        **Your Task:**
-        1.  Read through all the provided title-summary pairs.
-        2.  Identify the connections and overarching narrative across the sections.
-        3.  Write a **single, flowing final summary** that integrates the key information from *all* the provided summaries.
-        4.  **Crucially, ensure that every concept represented by the Bolded Headings is explicitly mentioned or clearly addressed within your final summary.** Weave these topics naturally into the narrative.
-        5.  The final output should be easy to read and understand, presenting a unified overview of the collective information.
-
-        **Generate the Final Summary based on the provided input data:**
-        {input_data}
-        """
-
-        logging.info(f"Prompt Template: {prompt_template}")
+        # Logging the full prompt on every request is significant string work
+        # and I/O, so only do it when debugging.
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("Prompt: %s", prompt)
 
         model_name = "gemini-2.5-flash-preview-04-17"
-        
-        response = client.models.generate_content(
+
+        # Use the async surface so the multi-second Gemini call doesn't block
+        # the event loop for other requests.
+        response = await client.aio.models.generate_content(
             model=f"models/{model_name}", # Model name format [5]
-            contents=prompt_template # Pass the formatted string [5]
+            contents=prompt # Pass the formatted string [5]
             # Optional generation config can be added here, e.g.,
             # generation_config=types.GenerationConfig(temperature=0.7) [8]
         )
@@ -123,7 +129,14 @@ mcp.mount()
 # An ASGI server like Uvicorn/Hypercorn will run the app in production (Cloud Run)
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
-    # Use uvicorn.run for local development
-    # --reload enables auto-reloading on code changes
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
-    # Note: Replace "main" with the actual name of your Python file (e.g., "app_fastapi.py" -> "app_fastapi:app")
\ No newline at end of file
+    # uvloop + httptools give a much faster event loop/parser than the
+    # asyncio defaults; WEB_CONCURRENCY controls the worker count (tune to
+    # the instance's CPU allocation on Cloud Run).
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WEB_CONCURRENCY", "2")),
+    )
\ No newline at end of file
@@ -1,10 +1,15 @@
+import asyncio
+import hashlib
+import json
 import logging
 import os
+from contextlib import asynccontextmanager
 from typing import List, Dict, Union
+from urllib.parse import urlparse, parse_qs
 
-from fastapi import FastAPI, HTTPException, Query
-from pytube import Playlist
-from pytube.exceptions import RegexMatchError, PytubeError
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from googleapiclient.errors import HttpError
 
 from fastapi_mcp import FastApiMCP
 
@@ -12,12 +17,53 @@ from fastapi_mcp import FastApiMCP
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# --- Configuration ---
+YOUTUBE_API_SERVICE_NAME = "youtube"
+YOUTUBE_API_VERSION = "v3"
+
+# --- Lifespan: shared YouTube API service ---
+# The Data API client is built once at startup (static_discovery avoids the
+# discovery-document fetch) and reused for every request.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # googleapiclient.discovery pulls in a large dependency tree, so import
+    # it at startup rather than module import to keep cold starts cheap.
+    from googleapiclient.discovery import build
+
+    api_key = os.environ.get("YOUTUBE_API_KEY")
+    if not api_key:
+        logger.error("FATAL: YOUTUBE_API_KEY environment variable not set.")
+        raise RuntimeError("YOUTUBE_API_KEY environment variable not set.")
+    app.state.youtube = build(
+        YOUTUBE_API_SERVICE_NAME,
+        YOUTUBE_API_VERSION,
+        developerKey=api_key,
+        cache_discovery=False,
+        static_discovery=True,
+    )
+    yield
+
 app = FastAPI(
     title="YouTube Playlist Video URL Extractor",
     description="API to fetch all video URLs from a public YouTube playlist.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+def extract_playlist_id(playlist_url: str) -> str:
+    """Extracts the playlist ID (the `list=` parameter) from a playlist URL.
+
+    Raises:
+        ValueError: If the URL does not contain a playlist ID.
+    """
+    parsed = urlparse(playlist_url)
+    playlist_ids = parse_qs(parsed.query).get("list")
+    if not playlist_ids or not playlist_ids[0]:
+        raise ValueError(
+            f"No playlist ID ('list=' parameter) found in URL: {playlist_url}"
+        )
+    return playlist_ids[0]
+
 @app.get(
     "/health",
     tags=["Health Check"],
@@ -39,6 +85,7 @@ async def health_check():
     response_model=Dict[str, Union[str, int, List[str]]]
 )
 async def get_playlist_videos(
+    request: Request,
     playlist_url: str = Query(
         ..., # Make parameter required
         description="The full URL of the public YouTube playlist (e.g., https://www.youtube.com/playlist?list=PLxxxx...)",
@@ -50,64 +97,95 @@ async def get_playlist_videos(
 
     - **playlist_url**: The full URL of the target YouTube playlist. Must be public.
     """
-    logger.info(f"Received request for playlist URL: {playlist_url}")
+    logger.info("Received request for playlist URL: %s", playlist_url)
 
     try:
-        playlist = Playlist(playlist_url)
-
-        # Accessing video_urls triggers the network request if not already cached.
-        # This might take a moment for long playlists.
-        logger.info(f"Fetching videos for playlist: '{playlist.title}' (owner: {playlist.owner})")
-
-        # Check if playlist is empty or inaccessible (sometimes throws KeyError instead of returning empty)
-        # Accessing len or first video can trigger fetch
-        if not playlist.video_urls:
-             # Attempting to access length might be needed to trigger potential errors for empty/private playlists
-             try:
-                 logger.warning(f"Playlist '{playlist.title}' appears empty or inaccessible after fetching URLs.")
-                 # Raise exception here as pytube might not always throw one for empty lists
-                 raise PytubeError(f"Playlist '{playlist.title}' is empty or video URLs could not be retrieved.")
-             except KeyError as ke:
-                 logger.error(f"KeyError encountered, potentially private or invalid playlist: {playlist_url}. Error: {ke}")
-                 raise HTTPException(
-                    status_code=404,
-                    detail=f"Playlist not found or is private. Could not retrieve video information. Pytube KeyError: {ke}"
-                ) from ke
-
-        video_urls = list(playlist.video_urls) # Convert generator to list
+        playlist_id = extract_playlist_id(playlist_url)
+    except ValueError as e:
+        logger.error("Invalid YouTube Playlist URL format: %s. Error: %s", playlist_url, e)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid YouTube Playlist URL format provided. Please check the URL. Error: {e}"
+        )
+
+    youtube = request.app.state.youtube
+    video_urls: List[str] = []
+
+    try:
+        # Each page is a blocking HTTPS call, so run it in a worker thread to
+        # keep the event loop free for other requests.
+        def _fetch_page(page_token):
+            api_request = youtube.playlistItems().list(
+                part="contentDetails",
+                playlistId=playlist_id,
+                maxResults=50,
+                pageToken=page_token
+            )
+            return api_request.execute()
+
+        response = await asyncio.to_thread(_fetch_page, None)
+        while True:
+            # Kick off the next page fetch before parsing the current one so
+            # the request is in flight while we do the Python-side work.
+            page_token = response.get("nextPageToken")
+            next_task = (
+                asyncio.create_task(asyncio.to_thread(_fetch_page, page_token))
+                if page_token else None
+            )
+
+            video_urls.extend(
+                f"https://www.youtube.com/watch?v={video_id}"
+                for item in response.get("items", [])
+                if (video_id := item.get("contentDetails", {}).get("videoId"))
+            )
+
+            if next_task is None:
+                break
+            response = await next_task
+
+        if not video_urls:
+            logger.warning("Playlist '%s' appears empty or inaccessible.", playlist_id)
+            raise HTTPException(
+                status_code=404,
+                detail=f"Playlist '{playlist_id}' is empty or video URLs could not be retrieved."
+            )
+
         count = len(video_urls)
-        logger.info(f"Successfully retrieved {count} video URLs from playlist '{playlist.title}'.")
+        logger.info("Successfully retrieved %d video URLs from playlist '%s'.", count, playlist_id)
 
-        return {
-            "playlist_title": playlist.title,
-            "playlist_url": playlist.playlist_url,
+        body = {
+            "playlist_id": playlist_id,
+            "playlist_url": playlist_url,
             "video_count": count,
             "video_urls": video_urls
         }
 
-    except RegexMatchError as e:
-        logger.error(f"Invalid YouTube Playlist URL format: {playlist_url}. Error: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid YouTube Playlist URL format provided. Please check the URL. Error: {e}"
-        )
-    except KeyError as e:
-         # This often happens if the playlist is private, deleted, or pytube fails to parse data
-        logger.error(f"KeyError encountered for playlist: {playlist_url}. Might be private, deleted, or parsing failed. Error: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=404, # Or 403 if definitively private, but 404 is safer
-            detail=f"Playlist not found, is private, or data could not be parsed. KeyError: {e}"
+        # Playlist contents change slowly, so let clients (and any CDN in
+        # front of Cloud Run) revalidate instead of re-running the fetch.
+        etag = hashlib.md5(json.dumps(body, sort_keys=True).encode()).hexdigest()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304)
+        return JSONResponse(
+            body,
+            headers={"ETag": etag, "Cache-Control": "public, max-age=300"}
         )
-    except PytubeError as e:
-        # Catch specific Pytube errors (network issues, extraction problems)
-        logger.error(f"A Pytube error occurred for playlist {playlist_url}: {e}", exc_info=True)
+
+    except HttpError as e:
+        logger.error("YouTube API HTTP error %s for playlist %s: %s", e.resp.status, playlist_url, e.content, exc_info=True)
+        if e.resp.status == 404:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Playlist not found or is private: {playlist_id}"
+            )
         raise HTTPException(
-            status_code=500, # Internal Server Error or specific code based on error type
-            detail=f"An error occurred while fetching playlist data: {e}"
+            status_code=502,
+            detail=f"YouTube API error while fetching playlist data: Status {e.resp.status}"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         # Catch any other unexpected errors
-        logger.error(f"An unexpected error occurred for playlist {playlist_url}: {e}", exc_info=True)
+        logger.error("An unexpected error occurred for playlist %s: %s", playlist_url, e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"An unexpected internal server error occurred: {e}"
@@ -133,4 +211,11 @@ mcp.mount()
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8080)) # Use PORT env var if available, default 8080
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WEB_CONCURRENCY", "2")),
+    )
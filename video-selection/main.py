@@ -1,23 +1,35 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
 import math
-from datetime import datetime, timezone
-from fastapi import FastAPI, HTTPException, Query
+from contextlib import asynccontextmanager
+
+import cachetools
+import ciso8601
+import httpx
+import numpy as np
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, HttpUrl, Field
 from typing import List, Optional
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
 
 # Load environment variables from .env file for local development
 load_dotenv()
 
+# Configure logging (print() writes were unbuffered and blocking on stdout)
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 # --- Configuration ---
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-YOUTUBE_API_SERVICE_NAME = "youtube"
-YOUTUBE_API_VERSION = "v3"
+YOUTUBE_API_BASE_URL = "https://www.googleapis.com/youtube/v3"
 
 if not YOUTUBE_API_KEY:
-    print("WARNING: YOUTUBE_API_KEY environment variable not set.")
+    logger.warning("YOUTUBE_API_KEY environment variable not set.")
     # In a real app, consider raising an error or having more robust handling.
 
 # --- Custom Scoring Configuration ---
@@ -32,6 +44,14 @@ RECENCY_SCALE_FACTOR = 1e10 # Example: Divide timestamp by 10 billion
 # How many videos to fetch initially to find the top 10 after custom sorting
 INITIAL_FETCH_COUNT = 50
 
+# --- Response Caches ---
+# search.list costs 100 quota units per call and videos.list 1 unit, so
+# repeated identical queries are served from memory instead. Search results
+# go stale quickly (5 min TTL); video statistics change slowly (1 h TTL).
+_search_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=512, ttl=300)
+_details_cache: cachetools.TTLCache = cachetools.TTLCache(maxsize=4096, ttl=3600)
+_cache_lock = asyncio.Lock()
+
 
 # --- Pydantic Models (remain the same) ---
 class VideoStatistics(BaseModel):
@@ -59,58 +79,86 @@ class VideoItem(BaseModel):
     # You could add the calculated score here for debugging if needed
     # customScore: Optional[float] = None
 
+# --- Lifespan: shared HTTP client ---
+# One pooled async client per process: keep-alive connections are reused
+# across requests and calls never block the event loop.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not YOUTUBE_API_KEY:
+        logger.warning("YOUTUBE_API_KEY environment variable not set.")
+    app.state.http = httpx.AsyncClient(
+        base_url=YOUTUBE_API_BASE_URL,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+        timeout=15,
+    )
+    yield
+    await app.state.http.aclose()
+
 # --- FastAPI App ---
 app = FastAPI(
     title="YouTube Video Search API",
     description="Search for top videos based on a custom score (view/like ratio & recency).",
-    version="1.1.0" # Increment version
+    version="1.1.0", # Increment version
+    lifespan=lifespan
 )
 
-# --- YouTube Service Helper (remains the same) ---
-def get_youtube_service():
+# --- YouTube API Helper ---
+async def youtube_api_get(http: httpx.AsyncClient, resource: str, params: dict) -> dict:
+    """Issues a GET against the YouTube Data API v3 and returns the JSON body."""
     if not YOUTUBE_API_KEY:
         raise HTTPException(status_code=500, detail="YouTube API Key is not configured on the server.")
-    try:
-        return build(YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, developerKey=YOUTUBE_API_KEY)
-    except Exception as e:
-        print(f"Error building YouTube service: {e}")
-        raise HTTPException(status_code=500, detail="Could not initialize YouTube service.")
+    response = await http.get(f"/{resource}", params={"key": YOUTUBE_API_KEY, **params})
+    response.raise_for_status()
+    return response.json()
 
 
 # --- Custom Score Calculation ---
-def calculate_score(view_count: Optional[int], like_count: Optional[int], published_at_str: str) -> float:
-    """Calculates a custom score based on view/like ratio and recency."""
-    # Ratio Component
-    ratio_score = 0.0
-    if view_count and like_count and view_count > 0:
-        ratio = like_count / view_count
-        # Simple ratio, potentially cap or use log scale if needed
-        ratio_score = ratio
-    elif like_count and like_count > 0 and (view_count is None or view_count == 0):
-         ratio_score = 0.01 # Assign a small default score if likes exist but views don't (unlikely but possible)
-
-    # Recency Component
-    recency_score = 0.0
+def parse_published_timestamp(published_at_str: str) -> float:
+    """Parses an ISO 8601 publish date into a POSIX timestamp (0.0 on failure).
+
+    ciso8601 parses in C and handles the trailing 'Z' natively, so there is
+    no per-video string replace or Python-level datetime parsing.
+    """
     try:
-        # Parse ISO 8601 string with timezone awareness
-        published_dt = datetime.fromisoformat(published_at_str.replace('Z', '+00:00'))
-        # Convert to POSIX timestamp (seconds since epoch, UTC)
-        published_timestamp = published_dt.timestamp()
-        # Scale the timestamp - adjust RECENCY_SCALE_FACTOR as needed
-        recency_score = published_timestamp / RECENCY_SCALE_FACTOR
+        return ciso8601.parse_datetime(published_at_str).timestamp()
     except (ValueError, TypeError):
-        print(f"Could not parse date: {published_at_str}")
+        logger.warning("Could not parse date: %s", published_at_str)
         # Handle invalid date format - assign zero score for recency
+        return 0.0
+
+
+def calculate_scores(
+    view_counts: List[Optional[int]],
+    like_counts: List[Optional[int]],
+    published_timestamps: List[float],
+) -> np.ndarray:
+    """Calculates custom scores (view/like ratio and recency) for all videos at once.
+
+    A single vectorized pass over parallel arrays replaces the previous
+    per-video Python loop, so the scoring cost stays flat as the fetch pool
+    grows.
+    """
+    views = np.array([v if v is not None else 0 for v in view_counts], dtype=np.float64)
+    likes = np.array([l if l is not None else 0 for l in like_counts], dtype=np.float64)
+    ts = np.array(published_timestamps, dtype=np.float64)
+
+    # Ratio component: likes/views where views exist; a small default score
+    # when likes exist but views don't (unlikely but possible).
+    ratio = np.where(views > 0, likes / np.maximum(views, 1.0), 0.0)
+    ratio = np.where((views == 0) & (likes > 0), 0.01, ratio)
+
+    # Recency component: scaled POSIX timestamp.
+    recency = ts / RECENCY_SCALE_FACTOR
 
     # Combined Weighted Score
     # Ensure weights sum roughly to 1 or normalize if preferred
-    final_score = (RATIO_WEIGHT * ratio_score) + (RECENCY_WEIGHT * recency_score)
-    return final_score
+    return (RATIO_WEIGHT * ratio) + (RECENCY_WEIGHT * recency)
 
 
 # --- API Endpoint ---
 @app.get("/search", response_model=List[VideoItem])
 async def search_videos_custom_score(
+    request: Request,
     query: str = Query(..., description="The search term or topic for videos."),
     max_results: int = Query(10, ge=1, le=INITIAL_FETCH_COUNT, description=f"Number of top results to return (1-{INITIAL_FETCH_COUNT}, default 10).")
 ):
@@ -118,47 +166,82 @@ async def search_videos_custom_score(
     Searches YouTube for videos based on a query and returns the top results
     sorted by a custom score combining view-to-like ratio and recency.
     """
-    youtube = get_youtube_service()
-    videos_with_scores = []
+    http = request.app.state.http
 
     try:
-        # 1. Search for a larger pool of relevant videos
-        print(f"Searching YouTube for '{query}', fetching up to {INITIAL_FETCH_COUNT} relevant videos...")
-        search_request = youtube.search().list(
-            q=query,
-            part="snippet",
-            type="video",
-            order="relevance", # Start with relevance to get a good initial pool
-            maxResults=INITIAL_FETCH_COUNT # Fetch more initially
-        )
-        search_response = search_request.execute()
-
-        video_ids = []
-        for item in search_response.get("items", []):
-            if item.get("id", {}).get("kind") == "youtube#video":
-                video_ids.append(item["id"]["videoId"])
+        # 1. Search for a larger pool of relevant videos (cached per query)
+        search_key = (query, INITIAL_FETCH_COUNT)
+        async with _cache_lock:
+            video_ids = _search_cache.get(search_key)
+
+        if video_ids is None:
+            logger.debug("Searching YouTube for %r, fetching up to %d relevant videos...", query, INITIAL_FETCH_COUNT)
+            search_response = await youtube_api_get(http, "search", {
+                "q": query,
+                "part": "snippet",
+                "type": "video",
+                "order": "relevance", # Start with relevance to get a good initial pool
+                "maxResults": INITIAL_FETCH_COUNT # Fetch more initially
+            })
+
+            video_ids = []
+            for item in search_response.get("items", []):
+                if item.get("id", {}).get("kind") == "youtube#video":
+                    video_ids.append(item["id"]["videoId"])
+
+            async with _cache_lock:
+                _search_cache[search_key] = video_ids
+        else:
+            logger.debug("Search cache hit for %r (%d video IDs).", query, len(video_ids))
 
         if not video_ids:
-            print("No video IDs found in initial search.")
+            logger.info("No video IDs found in initial search.")
             return []
 
-        print(f"Found {len(video_ids)} video IDs. Fetching details...")
+        logger.debug("Found %d video IDs. Fetching details...", len(video_ids))
 
-        # 2. Get statistics and precise snippets for the found video IDs
+        # 2. Get statistics and precise snippets for the found video IDs,
+        # fetching only the ones not already cached per video ID.
         # Need to fetch in batches if video_ids > 50 (max IDs per videos().list call)
-        detailed_videos = []
-        for i in range(0, len(video_ids), 50):
-             batch_ids = video_ids[i:i+50]
-             video_details_request = youtube.videos().list(
-                 part="snippet,statistics",
-                 id=",".join(batch_ids)
-             )
-             video_details_response = video_details_request.execute()
-             detailed_videos.extend(video_details_response.get("items", []))
-
-        print(f"Fetched details for {len(detailed_videos)} videos. Calculating scores...")
-
-        # 3. Calculate custom score for each video
+        # Each batch is independent, so dispatch them all concurrently instead
+        # of blocking on one batch before starting the next.
+        async def _fetch_batch(batch_ids: List[str]) -> List[dict]:
+            response = await youtube_api_get(http, "videos", {
+                "part": "snippet,statistics",
+                "id": ",".join(batch_ids)
+            })
+            return response.get("items", [])
+
+        async with _cache_lock:
+            cached_videos = {
+                vid: _details_cache[vid] for vid in video_ids if vid in _details_cache
+            }
+        missing_ids = [vid for vid in video_ids if vid not in cached_videos]
+
+        fetched_videos = []
+        if missing_ids:
+            batches = [missing_ids[i:i+50] for i in range(0, len(missing_ids), 50)]
+            batch_results = await asyncio.gather(*map(_fetch_batch, batches))
+            for items in batch_results:
+                fetched_videos.extend(items)
+            async with _cache_lock:
+                for video_data in fetched_videos:
+                    _details_cache[video_data["id"]] = video_data
+
+        # Preserve the search ordering when merging cached and fetched items.
+        by_id = {video_data["id"]: video_data for video_data in fetched_videos}
+        by_id.update(cached_videos)
+        detailed_videos = [by_id[vid] for vid in video_ids if vid in by_id]
+
+        logger.debug("Fetched details for %d videos. Calculating scores...", len(detailed_videos))
+
+        # 3. Collect scoring inputs per video; response objects are built
+        # only for the winners, so nothing full-size is materialized here
+        # beyond the parallel scoring arrays.
+        candidates = []
+        view_counts: List[Optional[int]] = []
+        like_counts: List[Optional[int]] = []
+        timestamps: List[float] = []
         for video_data in detailed_videos:
             video_id = video_data["id"]
             snippet = video_data.get("snippet", {})
@@ -173,43 +256,63 @@ async def search_videos_custom_score(
             like_count = int(like_count_str) if like_count_str else None
 
             if published_at: # Only proceed if we have a published date
-                score = calculate_score(view_count, like_count, published_at)
-
-                videos_with_scores.append({
-                    "id": video_id,
-                    "url": f"https://www.youtube.com/watch?v={video_id}",
-                    "title": snippet.get("title", "N/A"),
-                    "channelTitle": snippet.get("channelTitle", "N/A"),
-                    "publishedAt": published_at,
-                    "description": snippet.get("description"),
-                    "viewCount": view_count,
-                    "likeCount": like_count,
-                    "customScore": score # Store score for sorting
-                })
+                candidates.append((video_id, snippet, view_count, like_count, published_at))
+                view_counts.append(view_count)
+                like_counts.append(like_count)
+                timestamps.append(parse_published_timestamp(published_at))
             else:
-                print(f"Skipping video {video_id} due to missing publishedAt date.")
+                logger.debug("Skipping video %s due to missing publishedAt date.", video_id)
 
+        if not candidates:
+            return []
 
-        # 4. Sort videos by the calculated custom score (descending)
-        print(f"Calculated scores for {len(videos_with_scores)} videos. Sorting...")
-        videos_with_scores.sort(key=lambda x: x["customScore"], reverse=True)
+        # 4. Score every video in one vectorized pass
+        logger.debug("Scoring %d videos...", len(candidates))
+        scores = calculate_scores(view_counts, like_counts, timestamps)
 
         # 5. Select the top N results (default 10, or as specified by max_results)
-        top_videos = videos_with_scores[:max_results]
-        print(f"Returning top {len(top_videos)} videos based on custom score.")
-
-        # 6. Format into response model (excluding the customScore if not in the model)
-        results = [VideoItem(**video) for video in top_videos]
-        return results
+        # argpartition finds the top K in O(N) instead of sorting all N
+        # scores; only the K winners are then sorted for the final ordering.
+        if max_results < len(scores):
+            top_idx = np.argpartition(-scores, max_results)[:max_results]
+            order = top_idx[np.argsort(-scores[top_idx])]
+        else:
+            order = np.argsort(-scores)
+        logger.info("Returning top %d of %d videos for %r.", len(order), len(candidates), query)
+
+        # 6. Format only the top-K into the response model
+        results = []
+        for i in order:
+            video_id, snippet, view_count, like_count, published_at = candidates[i]
+            results.append(VideoItem(
+                id=video_id,
+                url=f"https://www.youtube.com/watch?v={video_id}",
+                title=snippet.get("title", "N/A"),
+                channelTitle=snippet.get("channelTitle", "N/A"),
+                publishedAt=published_at,
+                description=snippet.get("description"),
+                viewCount=view_count,
+                likeCount=like_count,
+            ))
+
+        # Popular search results change slowly; an ETag lets repeat callers
+        # (or a fronting CDN) skip the body transfer entirely.
+        body = jsonable_encoder(results)
+        etag = hashlib.md5(json.dumps(body, sort_keys=True).encode()).hexdigest()
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304)
+        return JSONResponse(
+            body,
+            headers={"ETag": etag, "Cache-Control": "public, max-age=300"}
+        )
 
-    except HttpError as e:
-        print(f"An HTTP error {e.resp.status} occurred: {e.content}")
-        error_content = e.content.decode('utf-8') if isinstance(e.content, bytes) else str(e.content)
-        raise HTTPException(status_code=e.resp.status, detail=f"YouTube API Error: {error_content}")
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        logger.error("An HTTP error %s occurred: %s", e.response.status_code, e.response.text)
+        raise HTTPException(status_code=e.response.status_code, detail=f"YouTube API Error: {e.response.text}")
     except Exception as e:
-        import traceback
-        print(f"An unexpected error occurred: {e}")
-        print(traceback.format_exc()) # Print stack trace for debugging
+        logger.error("An unexpected error occurred: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"An internal server error occurred: {str(e)}")
 
 
@@ -220,4 +323,11 @@ if __name__ == "__main__":
         print("ERROR: YOUTUBE_API_KEY environment variable not set. Create a .env file or set it.")
     else:
         print("Starting Uvicorn server for local development...")
-        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) # Added reload=True for convenience
\ No newline at end of file
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.environ.get("WEB_CONCURRENCY", "2")),
+        )
\ No newline at end of file
@@ -1,13 +1,21 @@
+import asyncio
+import io
+import json
 import os
 import logging
 import base64
 import binascii # For catching base64 decoding errors
+import time
 import uvicorn
 
+from typing import List, Literal, Optional
+
 from google import genai
 from google.genai import types
 
 from fastapi import FastAPI, HTTPException, Body # Import Body
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, HttpUrl # Import HttpUrl for better validation (optional)
 
 from fastapi_mcp import FastApiMCP
@@ -23,74 +31,134 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Summaries are natural-language text and compress well; gzip responses over
+# 512 bytes. Starlette's GZipMiddleware leaves text/event-stream responses
+# alone, so the SSE /summary/stream route is unaffected.
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
 # --- Environment Variable Check ---
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     logger.error("FATAL: GEMINI_API_KEY environment variable not set.")
 
+# --- Shared Gemini Client ---
+# One client per process: the HTTPS connection pool is reused across
+# requests instead of re-established per call (a fresh TLS handshake to
+# generativelanguage.googleapis.com costs ~50-200 ms and defeats HTTP/2
+# multiplexing). The async surface (client.aio) is used in the handlers so
+# generation never blocks the event loop. The transport timeout bounds how
+# long a stuck upstream call can pin a worker; video summarization is slow,
+# so it is generous but finite.
+client = (
+    genai.Client(
+        api_key=GEMINI_API_KEY,
+        http_options=types.HttpOptions(timeout=120_000),  # milliseconds
+    )
+    if GEMINI_API_KEY else None
+)
+
 class SummaryRequest(BaseModel):
     video_url: HttpUrl
+    # Summarization is usually a background workload, so default to the
+    # cheaper best-effort Flex tier; latency-critical callers can opt into
+    # "priority" per request.
+    tier: Literal["standard", "flex", "priority"] = "flex"
+
+class BatchSummaryRequest(BaseModel):
+    video_urls: List[HttpUrl]
 
 # --- Pydantic Models for Request/Response Schemas ---
 class SummaryResponse(BaseModel):
     summary: str = Field(..., description="The generated summary of the video.")
 
+class BatchJobResponse(BaseModel):
+    job_name: str = Field(..., description="Identifier of the Gemini batch job, to be polled via GET /summary/batch/{job_name}.")
+    state: str = Field(..., description="Current state of the batch job.")
+
 class ErrorDetail(BaseModel):
     error: str = Field(..., description="Description of the error.")
 
-# --- API Endpoints ---
-@app.post(
-    '/summary',
-    response_model=SummaryResponse,
-    responses={
-        400: {"model": ErrorDetail, "description": "Bad Request (e.g., invalid URL format in body, Gemini cannot access URL)"},
-        422: {"model": ErrorDetail, "description": "Validation Error (e.g., missing 'video_url' in body)"}, # FastAPI uses 422 for Pydantic errors
-        500: {"model": ErrorDetail, "description": "Internal Server Error (e.g., API key missing, unexpected Gemini API error)"},
-        503: {"model": ErrorDetail, "description": "Gemini API Service Unavailable or Processing Error"},
-    },
-    summary="Generate Video Summary",
-    operation_id="get_youtube_video_summary",
-    description="Accepts a JSON request body containing the video URL (`video_url`) and returns a text summary.",
-    tags=["Summarization"] # Tag for grouping in OpenAPI docs
-)
-async def generate_summary(
-    request_data: SummaryRequest = Body()
-):
-    """
-    FastAPI route handler for GET /summary requests.
-    Validates input, calls Gemini API, and returns the summary.
-    """
-    if not GEMINI_API_KEY:
-        logger.error("GEMINI_API_KEY is not configured.")
-        raise HTTPException(status_code=500, detail="Server configuration error: API key missing")
+# --- Gemini Request Construction ---
+MODEL_NAME = "gemini-2.5-flash-preview-04-17"
+SUMMARY_PROMPT = "identify the main topics and provide concise summary for each"
 
-    client = genai.Client(
-        api_key=GEMINI_API_KEY,
-    )
+# --- Gemini Context Caching ---
+# The instruction text (and config preamble) is identical on every request;
+# Gemini's context caching serves those tokens at a steep discount and
+# improves time-to-first-token. Best effort: short content can be rejected
+# as below the model's minimum cacheable size, in which case the instruction
+# is simply sent inline as before.
+_INSTRUCTION_CACHE_TTL_SECONDS = 3600
+_instruction_cache_name: Optional[str] = None
+_instruction_cache_expiry = 0.0
+_instruction_cache_failed = False
 
-    video_url = str(request_data.video_url)
-    logging.info(f"Summary video url: {video_url}")
+async def _get_cached_instruction() -> Optional[str]:
+    """Returns the name of the cached instruction content, creating or
+    refreshing it as needed, or None when context caching is unavailable."""
+    global _instruction_cache_name, _instruction_cache_expiry, _instruction_cache_failed
+    if _instruction_cache_failed:
+        return None
+    now = time.monotonic()
+    if _instruction_cache_name and now < _instruction_cache_expiry:
+        return _instruction_cache_name
+    try:
+        cache = await client.aio.caches.create(
+            model=MODEL_NAME,
+            config=types.CreateCachedContentConfig(
+                display_name="video-summary-instruction",
+                contents=[
+                    types.Content(
+                        role="user",
+                        parts=[types.Part.from_text(text=SUMMARY_PROMPT)],
+                    )
+                ],
+                ttl=f"{_INSTRUCTION_CACHE_TTL_SECONDS}s",
+            ),
+        )
+        _instruction_cache_name = cache.name
+        # Refresh a minute before the server-side TTL lapses.
+        _instruction_cache_expiry = now + _INSTRUCTION_CACHE_TTL_SECONDS - 60
+        logger.info("Created instruction context cache '%s'", cache.name)
+        return _instruction_cache_name
+    except Exception as e:
+        logger.warning("Context caching unavailable, sending the instruction inline: %s", e)
+        _instruction_cache_failed = True
+        return None
+
+def build_generation_request(video_url: str, tier: str = "flex", cached_content: Optional[str] = None):
+    """Builds the (contents, config) pair for a video summarization call.
 
+    When `cached_content` names a Gemini context cache holding the
+    instruction, only the video part is sent and the cache is referenced
+    from the config; otherwise the instruction text is sent inline.
+    """
     msg1_video1 = types.Part.from_uri(
         file_uri=video_url,
         mime_type="video/*",
     )
 
-    model = "gemini-2.5-flash-preview-04-17"
+    parts = [msg1_video1]
+    if cached_content is None:
+        parts.append(types.Part.from_text(text=SUMMARY_PROMPT))
+
     contents = [
         types.Content(
         role="user",
-        parts=[
-            msg1_video1,
-            types.Part.from_text(text="""identify the main topics and provide concise summary for each""")
-        ]
+        parts=parts
         ),
     ]
     generate_content_config = types.GenerateContentConfig(
-        temperature = 1,
-        top_p = 1,
+        cached_content = cached_content,
+        service_tier = tier,
+        # Lower sampling settings keep topic summaries focused and typically
+        # shorter; the token cap bounds worst-case decode latency and cost
+        # (65535 effectively told the scheduler to plan for a runaway
+        # response). 2048 tokens is ample for a per-topic summary.
+        temperature = 0.4,
+        top_p = 0.95,
         seed = 0,
-        max_output_tokens = 65535,
+        max_output_tokens = 2048,
         response_modalities = ["TEXT"],
         safety_settings = [types.SafetySetting(
         category="HARM_CATEGORY_HATE_SPEECH",
@@ -106,18 +174,287 @@ async def generate_summary(
         threshold="OFF"
         )],
     )
+    return contents, generate_content_config
+
+# --- API Endpoints ---
+@app.post(
+    '/summary',
+    response_model=SummaryResponse,
+    responses={
+        400: {"model": ErrorDetail, "description": "Bad Request (e.g., invalid URL format in body, Gemini cannot access URL)"},
+        422: {"model": ErrorDetail, "description": "Validation Error (e.g., missing 'video_url' in body)"}, # FastAPI uses 422 for Pydantic errors
+        500: {"model": ErrorDetail, "description": "Internal Server Error (e.g., API key missing, unexpected Gemini API error)"},
+        503: {"model": ErrorDetail, "description": "Gemini API Service Unavailable or Processing Error"},
+    },
+    summary="Generate Video Summary",
+    operation_id="get_youtube_video_summary",
+    description="Accepts a JSON request body containing the video URL (`video_url`) and returns a text summary.",
+    tags=["Summarization"] # Tag for grouping in OpenAPI docs
+)
+async def generate_summary(
+    request_data: SummaryRequest = Body()
+):
+    """
+    FastAPI route handler for GET /summary requests.
+    Validates input, calls Gemini API, and returns the summary.
+    """
+    if client is None:
+        logger.error("GEMINI_API_KEY is not configured.")
+        raise HTTPException(status_code=500, detail="Server configuration error: API key missing")
+
+    video_url = str(request_data.video_url)
+    logging.info(f"Summary video url: {video_url}")
+
+    contents, generate_content_config = build_generation_request(
+        video_url, tier=request_data.tier, cached_content=await _get_cached_instruction()
+    )
 
-    response = ""
-    for chunk in client.models.generate_content_stream(
-        model = model,
+    stream = await client.aio.models.generate_content_stream(
+        model = MODEL_NAME,
         contents = contents,
         config = generate_content_config,
-        ):
-        print(chunk.text, end="")
-        response = response + chunk.text
+    )
+    # Accumulate chunks in a list and join once: repeated `response +
+    # chunk.text` is O(N^2) in total output length, and the old per-chunk
+    # print() did a blocking stdout write on every chunk.
+    parts = []
+    async for chunk in stream:
+        # Safety-only or function-call chunks carry text=None; skip them
+        # rather than TypeError-ing on the join (and skip empty strings
+        # while we're at it).
+        t = chunk.text
+        if not t:
+            continue
+        parts.append(t)
+    response = "".join(parts)
+
+    # Returning a Response directly skips jsonable_encoder on the (possibly
+    # large) summary string; response_model still documents the shape.
+    return ORJSONResponse({"summary": response})
+
+
+@app.post(
+    '/summary/stream',
+    responses={
+        200: {"content": {"text/event-stream": {}}, "description": "SSE stream of summary deltas"},
+        400: {"model": ErrorDetail, "description": "Bad Request (e.g., invalid URL format in body, Gemini cannot access URL)"},
+        422: {"model": ErrorDetail, "description": "Validation Error (e.g., missing 'video_url' in body)"},
+        500: {"model": ErrorDetail, "description": "Internal Server Error (e.g., API key missing, unexpected Gemini API error)"},
+    },
+    summary="Stream Video Summary",
+    operation_id="stream_youtube_video_summary",
+    description="Accepts a JSON request body containing the video URL (`video_url`) and streams the summary as server-sent events, one `delta` per generated chunk.",
+    tags=["Summarization"]
+)
+async def stream_summary(
+    request_data: SummaryRequest = Body()
+):
+    """
+    Streams the summary to the client as it is generated, so the first
+    tokens arrive immediately instead of after the full (often multi-second)
+    generation finishes.
+    """
+    if client is None:
+        logger.error("GEMINI_API_KEY is not configured.")
+        raise HTTPException(status_code=500, detail="Server configuration error: API key missing")
+
+    video_url = str(request_data.video_url)
+    logging.info(f"Streaming summary for video url: {video_url}")
+
+    contents, generate_content_config = build_generation_request(
+        video_url, tier=request_data.tier, cached_content=await _get_cached_instruction()
+    )
+
+    async def event_stream():
+        stream = await client.aio.models.generate_content_stream(
+            model = MODEL_NAME,
+            contents = contents,
+            config = generate_content_config,
+        )
+        async for chunk in stream:
+            # Same guard as /summary: chunks without text would otherwise
+            # produce pointless `{"delta": null}` events.
+            t = chunk.text
+            if not t:
+                continue
+            yield f"data: {json.dumps({'delta': t})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.post(
+    '/summaries',
+    responses={
+        422: {"model": ErrorDetail, "description": "Validation Error (e.g., missing or invalid 'video_urls' in body)"},
+        500: {"model": ErrorDetail, "description": "Internal Server Error (e.g., API key missing)"},
+    },
+    summary="Generate Summaries for Multiple Videos",
+    operation_id="get_youtube_video_summaries",
+    description="Accepts a list of video URLs and returns a summary per URL. The videos are summarized concurrently over the shared client, so N videos cost roughly one round-trip of wall time instead of N.",
+    tags=["Summarization"]
+)
+async def generate_summaries(
+    request_data: BatchSummaryRequest = Body()
+):
+    """
+    Summarizes several videos in one call. Each URL gets its own Gemini
+    request, issued concurrently and bounded by a semaphore so a large list
+    cannot exhaust rate limits; per-URL failures are reported inline rather
+    than failing the whole batch.
+    """
+    if client is None:
+        logger.error("GEMINI_API_KEY is not configured.")
+        raise HTTPException(status_code=500, detail="Server configuration error: API key missing")
+
+    logger.info("Generating summaries for %d videos", len(request_data.video_urls))
+    cached_content = await _get_cached_instruction()
+    semaphore = asyncio.Semaphore(8)
+
+    async def one_summary(video_url: str):
+        contents, generate_content_config = build_generation_request(
+            video_url, cached_content=cached_content
+        )
+        async with semaphore:
+            response = await client.aio.models.generate_content(
+                model=MODEL_NAME,
+                contents=contents,
+                config=generate_content_config,
+            )
+        return response.text or ""
+
+    urls = [str(u) for u in request_data.video_urls]
+    results = await asyncio.gather(
+        *(one_summary(url) for url in urls), return_exceptions=True
+    )
+
+    summaries = {}
+    errors = {}
+    for url, result in zip(urls, results):
+        if isinstance(result, BaseException):
+            logger.error("Summary failed for %s: %s", url, result)
+            errors[url] = str(result)
+        else:
+            summaries[url] = result
+
+    return ORJSONResponse({"summaries": summaries, "errors": errors})
+
+
+@app.post(
+    '/summary/batch',
+    response_model=BatchJobResponse,
+    responses={
+        422: {"model": ErrorDetail, "description": "Validation Error (e.g., missing or invalid 'video_urls' in body)"},
+        500: {"model": ErrorDetail, "description": "Internal Server Error (e.g., API key missing)"},
+        503: {"model": ErrorDetail, "description": "Gemini API Service Unavailable or Batch Submission Error"},
+    },
+    summary="Submit Batch Video Summarization Job",
+    operation_id="submit_youtube_video_summary_batch",
+    description="Accepts a list of video URLs and submits them to the Gemini Batch API. Returns a job name to poll via GET /summary/batch/{job_name}. Batch processing is roughly half the price of the synchronous endpoint and has higher rate limits, at the cost of non-interactive latency.",
+    tags=["Summarization"]
+)
+async def submit_summary_batch(
+    request_data: BatchSummaryRequest = Body()
+):
+    """
+    Submits all requested videos as one Gemini Batch API job. Intended for
+    offline/bulk callers (e.g. re-summarizing a channel backlog) that don't
+    need the seconds-scale latency of POST /summary.
+    """
+    if client is None:
+        logger.error("GEMINI_API_KEY is not configured.")
+        raise HTTPException(status_code=500, detail="Server configuration error: API key missing")
+
+    logger.info("Submitting batch summary job for %d videos", len(request_data.video_urls))
+
+    # One JSONL line per video; the key ties each result row back to its URL.
+    jsonl_lines = []
+    for video_url in request_data.video_urls:
+        jsonl_lines.append(json.dumps({
+            "key": str(video_url),
+            "request": {
+                "contents": [{
+                    "role": "user",
+                    "parts": [
+                        {"file_data": {"file_uri": str(video_url), "mime_type": "video/*"}},
+                        {"text": SUMMARY_PROMPT},
+                    ],
+                }],
+            },
+        }))
+    jsonl_payload = io.BytesIO("\n".join(jsonl_lines).encode("utf-8"))
+
+    try:
+        uploaded = await client.aio.files.upload(
+            file=jsonl_payload,
+            config=types.UploadFileConfig(
+                display_name="video-summary-batch-input",
+                mime_type="application/jsonl",
+            ),
+        )
+        job = await client.aio.batches.create(
+            model=MODEL_NAME,
+            src=uploaded.name,
+            config={"display_name": "video-summary-batch"},
+        )
+    except Exception as e:
+        logger.error(f"Failed to submit batch job: {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail=f"Error submitting batch job: {e}")
+
+    return BatchJobResponse(job_name=job.name, state=str(job.state))
+
+
+@app.get(
+    '/summary/batch/{job_name:path}',
+    responses={
+        404: {"model": ErrorDetail, "description": "Batch job not found"},
+        500: {"model": ErrorDetail, "description": "Internal Server Error (e.g., API key missing)"},
+        503: {"model": ErrorDetail, "description": "Gemini API Service Unavailable"},
+    },
+    summary="Poll Batch Video Summarization Job",
+    operation_id="get_youtube_video_summary_batch",
+    description="Returns the state of a previously submitted batch job. Once the job has succeeded, the response also contains the per-URL summaries keyed by video URL.",
+    tags=["Summarization"]
+)
+async def get_summary_batch(job_name: str):
+    """
+    Polls a Gemini batch job and, once it has succeeded, downloads the
+    result file and returns the summaries keyed by video URL.
+    """
+    if client is None:
+        logger.error("GEMINI_API_KEY is not configured.")
+        raise HTTPException(status_code=500, detail="Server configuration error: API key missing")
+
+    try:
+        job = await client.aio.batches.get(name=job_name)
+    except Exception as e:
+        logger.error(f"Failed to fetch batch job '{job_name}': {e}", exc_info=True)
+        raise HTTPException(status_code=404, detail=f"Batch job not found: {job_name}")
+
+    state = str(job.state)
+    if state != "JobState.JOB_STATE_SUCCEEDED":
+        return {"job_name": job.name, "state": state}
+
+    try:
+        result_bytes = await client.aio.files.download(file=job.dest.file_name)
+    except Exception as e:
+        logger.error(f"Failed to download batch results for '{job_name}': {e}", exc_info=True)
+        raise HTTPException(status_code=503, detail=f"Error downloading batch results: {e}")
+
+    summaries = {}
+    for line in result_bytes.decode("utf-8").splitlines():
+        if not line:
+            continue
+        row = json.loads(line)
+        candidates = row.get("response", {}).get("candidates", [])
+        text = "".join(
+            part.get("text", "")
+            for candidate in candidates
+            for part in candidate.get("content", {}).get("parts", [])
+        )
+        summaries[row.get("key")] = text
+
+    return {"job_name": job.name, "state": state, "summaries": summaries}
 
-    return SummaryResponse(summary=response)
-    
 
 @app.get(
     '/',
@@ -144,6 +481,17 @@ mcp.mount()
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
     logger.info(f"Starting FastAPI server on host 0.0.0.0:{port}")
-    # Use uvicorn to run the FastAPI app
-    # reload=True is useful for development, disable for production
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    # reload's file watcher forces a single worker, so only enable it when
+    # explicitly developing; otherwise run multi-worker on the uvloop event
+    # loop and httptools parser (the Dockerfile CMD does the same).
+    if os.environ.get("ENV") == "dev":
+        uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=port,
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.environ.get("WEB_CONCURRENCY", "2")),
+        )
\ No newline at end of file
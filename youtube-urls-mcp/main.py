@@ -1,16 +1,25 @@
+import asyncio
+import atexit
 import os
 import logging
+import queue
+import re
+from logging.handlers import QueueHandler, QueueListener
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone, date
 from typing import List, Optional
 
 # --- FastAPI Imports ---
-from fastapi import FastAPI, HTTPException, Query, Depends
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import uvicorn # For running the app locally
 
-# --- Google API Imports ---
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+# --- HTTP Client ---
+import httpx
+
+import cachetools
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 # --- Pydantic Model for Response Structure ---
 from pydantic import BaseModel, HttpUrl
@@ -19,20 +28,90 @@ from fastapi_mcp import FastApiMCP
 
 # Configure logging - FastAPI doesn't configure root logger by default
 # Same configuration as before is fine.
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Records go through an in-memory queue and are written to stderr by a
+# dedicated listener thread, so the blocking write (and the handler lock)
+# never happens on the event loop.
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
+_log_listener = QueueListener(_log_queue, _stream_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__) # Get a specific logger
 
 # --- Configuration ---
-API_SERVICE_NAME = "youtube"
-API_VERSION = "v3"
+YOUTUBE_API_BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+# Compiled once; the capture groups let the date be constructed directly,
+# which is ~3x faster than strptime.
+_DATE_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+
+def _is_retryable_api_error(exc: BaseException) -> bool:
+    """Retry only transient upstream failures: 429 and 5xx. Client errors
+    like 403 (quota/key) or 404 would fail identically on every attempt."""
+    return isinstance(exc, httpx.HTTPStatusError) and (
+        exc.response.status_code == 429 or exc.response.status_code >= 500
+    )
+
+def _parse_target_date(target_date_str: str) -> date:
+    """Validates a YYYY-MM-DD string and returns it as a date.
+
+    Raises:
+        ValueError: If the string is not a valid calendar date.
+    """
+    m = _DATE_RE.match(target_date_str)
+    if not m:
+        raise ValueError(f"Invalid date format: '{target_date_str}'. Use YYYY-MM-DD.")
+    # date() still rejects impossible dates like 2024-13-40.
+    return date(int(m[1]), int(m[2]), int(m[3]))
+
+# --- Result Cache ---
+# Each search.list call costs 100 quota units, and the same
+# (channel_id, date) pair is often requested repeatedly. A past date's
+# upload list can no longer change, so it is cached for a long time; today's
+# list can still grow, so it only gets a short TTL. Keyed by
+# (channel_id, target_date_str).
+_past_cache = cachetools.TTLCache(maxsize=1024, ttl=30 * 24 * 3600)
+_today_cache = cachetools.TTLCache(maxsize=256, ttl=60)
+_cache_lock = asyncio.Lock()
+
+# --- Lifespan: shared HTTP client ---
+# One pooled async client per process: pagination round-trips reuse
+# keep-alive connections and never block the event loop, unlike the
+# synchronous googleapiclient/httplib2 stack this replaces.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    api_key = os.environ.get("YOUTUBE_API_KEY")
+    if not api_key:
+        logger.error("FATAL: YOUTUBE_API_KEY environment variable not set.")
+        raise RuntimeError("YOUTUBE_API_KEY environment variable not set.")
+    app.state.youtube_api_key = api_key
+    # Per-phase timeouts: a worker should never sit on a hung connect or a
+    # stalled read for the default (very long) socket timeout.
+    app.state.http = httpx.AsyncClient(
+        base_url=YOUTUBE_API_BASE_URL,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=httpx.Timeout(connect=3.0, read=30.0, write=5.0, pool=1.0),
+    )
+    yield
+    await app.state.http.aclose()
 
 # --- Initialize FastAPI App ---
 app = FastAPI(
     title="YouTube Video Fetcher API",
     description="Fetches YouTube video URLs for a specific channel on a given date.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson serializes responses several times faster than the stdlib json
+    # encoder FastAPI uses by default.
+    default_response_class=ORJSONResponse
 )
 
+# Hundreds of near-identical YouTube URLs compress 5-10x; gzip the response
+# when the client advertises support. Tiny payloads aren't worth the CPU.
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
 # --- Pydantic Response Model ---
 # This improves documentation and ensures response consistency
 class VideoResponse(BaseModel):
@@ -40,44 +119,48 @@ class VideoResponse(BaseModel):
     date: str # Keep as string to match input format
     video_urls: List[HttpUrl] # Use HttpUrl for validation
 
-# --- Dependency for API Key ---
-# Using Depends makes testing easier and centralizes key retrieval
-def get_api_key() -> str:
-    """Retrieves the YouTube API Key from environment variables."""
-    api_key = os.environ.get("YOUTUBE_API_KEY")
-    if not api_key:
-        logger.error("FATAL: YOUTUBE_API_KEY environment variable not set.")
-        # Raise HTTPException here, which FastAPI automatically handles
-        raise HTTPException(
-            status_code=500,
-            detail="Server configuration error: API key missing"
-        )
-    return api_key
+# A channel's uploads playlist ID is derived from the channel ID and never
+# changes, so it can be cached for the life of the process.
+_uploads_cache = cachetools.LRUCache(maxsize=4096)
 
-# --- YouTube Service Logic (mostly unchanged) ---
-# Consider adding caching here if the service is built often
-# Using Depends helps manage the service lifecycle if needed later (e.g., reuse)
-def get_youtube_service(api_key: str = Depends(get_api_key)) -> build:
-    """Builds and returns the YouTube API service object."""
-    try:
-        youtube = build(API_SERVICE_NAME, API_VERSION, developerKey=api_key)
-        logger.info("Successfully built YouTube service.")
-        return youtube
-    except Exception as e:
-        logger.error(f"Error building YouTube service: {e}")
-        # Re-raise as HTTPException for FastAPI to handle
-        raise HTTPException(
-            status_code=503, # Service Unavailable might be appropriate
-            detail=f"Could not connect to YouTube API: {e}"
-        )
+async def _get_uploads_playlist_id(http: httpx.AsyncClient, api_key: str, channel_id: str) -> str:
+    """Resolves (and caches indefinitely) a channel's uploads playlist ID.
 
-def get_channel_videos_for_date(youtube: build, channel_id: str, target_date_str: str) -> List[str]:
+    Raises:
+        HTTPException: 404 if the channel does not exist.
+        httpx.HTTPStatusError: If a YouTube API error occurs.
+    """
+    async with _cache_lock:
+        playlist_id = _uploads_cache.get(channel_id)
+    if playlist_id:
+        return playlist_id
+
+    api_response = await http.get(
+        "/channels",
+        params={"key": api_key, "part": "contentDetails", "id": channel_id},
+    )
+    api_response.raise_for_status()
+    items = api_response.json().get("items", [])
+    if not items:
+        raise HTTPException(status_code=404, detail=f"Channel '{channel_id}' not found")
+    playlist_id = items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+
+    async with _cache_lock:
+        _uploads_cache[channel_id] = playlist_id
+    return playlist_id
+
+async def get_channel_videos_for_date(http: httpx.AsyncClient, api_key: str, channel_id: str, target_date_str: str) -> List[str]:
     """
     Fetches YouTube video URLs uploaded by a specific channel on a specific date.
-    (Core logic remains the same as the Flask version)
+
+    Walks the channel's uploads playlist instead of calling search.list:
+    playlistItems.list costs 1 quota unit per page versus 100 for a search,
+    and the playlist is newest-first so pagination can stop as soon as it
+    reaches videos older than the target day.
 
     Args:
-        youtube: Authorized YouTube API service instance.
+        http: Shared async HTTP client bound to the YouTube Data API base URL.
+        api_key: YouTube Data API key, sent as the `key` query parameter.
         channel_id: The ID of the YouTube channel (starts with UC...).
         target_date_str: The target date in 'YYYY-MM-DD' format.
 
@@ -86,68 +169,92 @@ def get_channel_videos_for_date(youtube: build, channel_id: str, target_date_str
 
     Raises:
         ValueError: If the date format is invalid.
-        HttpError: If a YouTube API error occurs. (Handled by the caller route)
+        HTTPException: 404 if the channel does not exist.
+        httpx.HTTPStatusError: If a YouTube API error occurs. (Handled by the caller route)
         Exception: For other unexpected errors. (Handled by the caller route)
     """
     video_urls = []
     try:
-        # Validate and parse the date (raises ValueError if invalid)
-        target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
-    except ValueError as e:
-        logger.warning(f"Invalid date format provided: '{target_date_str}'")
-        raise ValueError(f"Invalid date format: '{target_date_str}'. Use YYYY-MM-DD.") from e # Re-raise to be caught by route
-
-    # Define the time range for the target date in UTC
-    start_datetime_utc = datetime(target_date.year, target_date.month, target_date.day, 0, 0, 0, tzinfo=timezone.utc)
-    end_datetime_utc = start_datetime_utc + timedelta(days=1)
-
-    published_after = start_datetime_utc.isoformat().replace("+00:00", "Z")
-    published_before = end_datetime_utc.isoformat().replace("+00:00", "Z")
+        target_date = _parse_target_date(target_date_str)
+    except ValueError:
+        logger.warning("Invalid date format provided: '%s'", target_date_str)
+        raise # Caught by the route and turned into a 400
+
+    # The range brackets the target date in UTC. Formatting directly avoids
+    # the datetime construction + isoformat() + str.replace() round-trip.
+    published_after = f"{target_date_str}T00:00:00Z"
+    published_before = (target_date + timedelta(days=1)).strftime("%Y-%m-%dT00:00:00Z")
+
+    logger.debug("Fetching uploads for channel '%s' between %s and %s", channel_id, published_after, published_before)
+
+    uploads_playlist_id = await _get_uploads_playlist_id(http, api_key, channel_id)
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential_jitter(initial=0.2, max=2.0),
+        retry=retry_if_exception(_is_retryable_api_error),
+        reraise=True,
+    )
+    async def _fetch_page(page_token: Optional[str]) -> dict:
+        params = {
+            "key": api_key,
+            "part": "contentDetails",
+            "playlistId": uploads_playlist_id,
+            "maxResults": 50,
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        # This can raise httpx.HTTPStatusError
+        api_response = await http.get("/playlistItems", params=params)
+        api_response.raise_for_status()
+        return api_response.json()
 
-    logger.info(f"Searching for videos in channel '{channel_id}' between {published_after} and {published_before}")
-
-    next_page_token = None
     try:
+        # Two-deep prefetch: as soon as a page's token is known, the next
+        # request goes on the wire while the current page is being parsed,
+        # instead of strictly fetch-parse-fetch-parse.
+        next_task = asyncio.create_task(_fetch_page(None))
+        past_target_day = False
+        page_count = 0
         while True:
-            # This block can raise HttpError
-            request_api = youtube.search().list(
-                part="snippet",
-                channelId=channel_id,
-                type="video",
-                order="date",
-                publishedAfter=published_after,
-                publishedBefore=published_before,
-                maxResults=50,
-                pageToken=next_page_token
+            response = await next_task
+            page_count += 1
+            next_page_token = response.get("nextPageToken")
+            next_task = (
+                asyncio.create_task(_fetch_page(next_page_token))
+                if next_page_token else None
             )
-            response = request_api.execute()
 
+            # Timestamps are RFC 3339 UTC, so lexicographic comparison
+            # orders them correctly without any parsing.
             for item in response.get("items", []):
-                video_id = item.get("id", {}).get("videoId")
-                published_at_str = item.get("snippet", {}).get("publishedAt")
-                if video_id and published_at_str:
-                     try:
-                         # More robust parsing: Handles potential timezone variations better
-                         published_dt_utc = datetime.fromisoformat(published_at_str.replace('Z', '+00:00')).astimezone(timezone.utc)
-                         # Compare dates directly
-                         if published_dt_utc.date() == target_date:
-                             video_url = f"https://www.youtube.com/watch?v={video_id}"
-                             video_urls.append(video_url)
-                             logger.info(f"Found video: {video_url} published at {published_at_str}")
-                         else:
-                              logger.debug(f"Video {video_id} returned by API but published on {published_dt_utc.date()} (outside target {target_date}). Skipping.")
-                     except ValueError:
-                         logger.warning(f"Could not parse published date '{published_at_str}' for video {video_id}. Skipping.")
-
-            next_page_token = response.get("nextPageToken")
-            if not next_page_token:
+                content_details = item.get("contentDetails", {})
+                video_id = content_details.get("videoId")
+                published_at = content_details.get("videoPublishedAt")
+                if not video_id or not published_at:
+                    continue
+                if published_at >= published_before:
+                    # Newer than the target day; keep scanning downwards.
+                    continue
+                if published_at < published_after:
+                    # Playlist is newest-first: everything below is older
+                    # than the target day, so stop paginating.
+                    past_target_day = True
+                    break
+                video_urls.append(f"https://www.youtube.com/watch?v={video_id}")
+
+            if past_target_day and next_task is not None:
+                next_task.cancel()
+                next_task = None
+            if next_task is None:
                 break
 
-        logger.info(f"Found {len(video_urls)} videos for channel '{channel_id}' on {target_date_str}.")
+        # One aggregate line per request instead of one per video/page.
+        logger.info("channel=%s date=%s videos=%d pages=%d", channel_id, target_date_str, len(video_urls), page_count)
         return video_urls
 
-    except HttpError as e:
-        # Let the route handler catch and process HttpError
+    except httpx.HTTPStatusError as e:
+        # Let the route handler catch and process API errors
         raise e
     except Exception as e:
         # Let the route handler catch unexpected errors
@@ -170,6 +277,7 @@ async def index():
     summary="Retrieves a list of YouTube video URLs published by a specific channel on a specified date"
 )
 async def handle_get_videos(
+    request: Request,
     channel_id: str = Query(
         ..., # Ellipsis means the parameter is required
         description="The ID of the YouTube channel (e.g., UC...).",
@@ -179,33 +287,57 @@ async def handle_get_videos(
         ...,
         alias="date", # Allows using ?date=YYYY-MM-DD in the URL
         description="Target date in YYYY-MM-DD format.",
-        regex=r"^\d{4}-\d{2}-\d{2}$" # Regex validation for format
-    ),
-    youtube_service: build = Depends(get_youtube_service) # Inject YouTube service
+        # Format is validated once in the handler via _DATE_RE; a second
+        # regex here would re-run the same check per request.
+    )
 ):
     """
     Retrieves a list of YouTube video URLs published by a specific channel
     on a specified date.
     """
-    logger.info(f"Received request for channel_id='{channel_id}', date='{target_date_str}'")
+    logger.debug("Received request for channel_id='%s', date='%s'", channel_id, target_date_str)
 
     try:
-        video_list = get_channel_videos_for_date(youtube_service, channel_id, target_date_str)
-
-        # Return data matching the VideoResponse model
-        return VideoResponse(
-            channel_id=channel_id,
-            date=target_date_str,
-            video_urls=video_list
-        )
+        target_date = _parse_target_date(target_date_str)
+        today = datetime.now(timezone.utc).date()
+
+        # A future date cannot have uploads yet; answer without burning quota.
+        if target_date > today:
+            return ORJSONResponse({"channel_id": channel_id, "date": target_date_str, "video_urls": []})
+
+        cache = _past_cache if target_date < today else _today_cache
+        cache_key = (channel_id, target_date_str)
+        async with _cache_lock:
+            video_list = cache.get(cache_key)
+
+        if video_list is None:
+            video_list = await get_channel_videos_for_date(
+                request.app.state.http,
+                request.app.state.youtube_api_key,
+                channel_id,
+                target_date_str,
+            )
+            async with _cache_lock:
+                cache[cache_key] = video_list
+        else:
+            logger.debug("Cache hit for channel '%s', date '%s'", channel_id, target_date_str)
+
+        # Returning a Response directly skips jsonable_encoder and Pydantic
+        # re-validation of the (possibly hundreds of) URLs; the
+        # response_model on the route still documents the shape.
+        return ORJSONResponse({
+            "channel_id": channel_id,
+            "date": target_date_str,
+            "video_urls": video_list
+        })
 
     except ValueError as e:
         # Handle invalid date format from get_channel_videos_for_date
-        logger.warning(f"Bad request: Invalid date format '{target_date_str}'. {e}")
+        logger.warning("Bad request: Invalid date format '%s'. %s", target_date_str, e)
         raise HTTPException(status_code=400, detail=str(e)) # 400 Bad Request
-    except HttpError as e:
-        logger.error(f"YouTube API HTTP error {e.resp.status} occurred: {e.content}")
-        status_code = e.resp.status
+    except httpx.HTTPStatusError as e:
+        logger.error("YouTube API HTTP error %s occurred: %s", e.response.status_code, e.response.text)
+        status_code = e.response.status_code
         detail = f"YouTube API error: Status {status_code}"
         http_status_code = 502 # Default to 502 Bad Gateway for upstream API errors
 
@@ -220,8 +352,10 @@ async def handle_get_videos(
             http_status_code = 503 # Service Unavailable
 
         raise HTTPException(status_code=http_status_code, detail=detail)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.exception(f"An unexpected error occurred processing request for channel '{channel_id}', date '{target_date_str}'")
+        logger.exception("An unexpected error occurred processing request for channel '%s', date '%s'", channel_id, target_date_str)
         raise HTTPException(
             status_code=500,
             detail="An internal server error occurred"
@@ -242,9 +376,19 @@ mcp.mount()
 # Use Uvicorn to run the FastAPI app
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8080))
-    logger.info(f"Starting Uvicorn server on host 0.0.0.0, port {port}")
-    # Use reload=True for development, disable for production-like testing
-    # Set log_level based on your preference or environment
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True, log_level="info")
-    # To run without auto-reload (like in production):
-    # uvicorn.run("main:app", host="0.0.0.0", port=port, log_level="info")
\ No newline at end of file
+    logger.info("Starting Uvicorn server on host 0.0.0.0, port %s", port)
+    # reload's file watcher forces a single worker, so only enable it when
+    # explicitly developing; otherwise run multi-worker on the uvloop event
+    # loop and httptools parser (the Dockerfile CMD does the same).
+    if os.environ.get("ENV") == "dev":
+        uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True, log_level="info")
+    else:
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=port,
+            log_level="info",
+            loop="uvloop",
+            http="httptools",
+            workers=int(os.environ.get("WEB_CONCURRENCY", "2")),
+        )
\ No newline at end of file